@@ -1,14 +1,35 @@
 import csv
+import json
+import logging
 import os
+import sys
 from pathlib import Path
 from subprocess import CompletedProcess
 from tempfile import TemporaryDirectory
 
 import pytest
 
-from vegeta_ss.__main__ import VegetaAttacker, evaluate_trial, save_results
+from vegeta_ss.__main__ import (
+    EXIT_ERROR,
+    EXIT_PASS,
+    EXIT_REGRESSION,
+    BracketSearch,
+    VegetaAttacker,
+    apply_overrides,
+    build_searches,
+    evaluate_trial,
+    main,
+    save_results,
+    summarize,
+)
 from vegeta_ss.models import AttackReport, HTTPMethod, Target, ExperimentParameters
-from vegeta_ss.utils import format_time
+from vegeta_ss.utils import (
+    LOG_FORMAT,
+    JsonFormatter,
+    UnformattedQueueHandler,
+    format_time,
+    logger,
+)
 
 test_target_get = Target(
     name="test_target_get", method=HTTPMethod("GET"), url="http://localhost"
@@ -249,6 +270,14 @@ def test_evaluate_trial_success():
     assert breaking_point == 100
 
 
+def test_evaluate_trial_label(caplog):
+    with caplog.at_level("INFO", logger="vegeta_ss.utils"):
+        evaluate_trial(100, test_result, 1, 1, 0, 100, 0, "first[run_1]")
+
+    assert caplog.messages
+    assert all(m.startswith("first[run_1]: ") for m in caplog.messages)
+
+
 def test_format_time():
     assert format_time(100) == "100ns"
     assert format_time(1000) == "1μs"
@@ -260,6 +289,49 @@ def test_format_time():
     assert format_time(3600 * 1e9) == "3600.0s"  # 1 hour in nanoseconds
 
 
+def test_logger_is_queued():
+    assert [type(handler) for handler in logger.handlers] == [UnformattedQueueHandler]
+
+
+def test_queue_handler_does_not_format():
+    record = logging.LogRecord(
+        "test", logging.INFO, __file__, 42, "Rate: %s", (100,), None
+    )
+
+    prepared = UnformattedQueueHandler(None).prepare(record)
+
+    assert prepared is record
+    assert (prepared.msg, prepared.args) == ("Rate: %s", (100,))
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "test", logging.INFO, __file__, 42, "Rate: %s", (100,), None
+    )
+
+    line = json.loads(JsonFormatter(LOG_FORMAT).format(record))
+
+    assert line["level"] == "INFO"
+    assert line["message"] == "Rate: 100"
+    assert line["path"] == "test/unit/test_main.py"
+    assert line["line"] == 42
+    assert "exception" not in line
+
+
+def test_json_formatter_exception():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.LogRecord(
+            "test", logging.ERROR, __file__, 42, "failed", None, sys.exc_info()
+        )
+
+    line = json.loads(JsonFormatter(LOG_FORMAT).format(record))
+
+    assert line["message"] == "failed"
+    assert "RuntimeError: boom" in line["exception"]
+
+
 @pytest.fixture
 def temp_directory():
     with TemporaryDirectory() as temp_dir:
@@ -315,3 +387,349 @@ def test_save_results(temp_directory):
 
     # Clean up the temporary file
     result_file_path.unlink()
+
+
+def test_bracket_search(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    failed_result = test_result.model_copy(update={"success": 0.5})
+    mocker.patch.object(VegetaAttacker, "run_attack", return_value=failed_result)
+    params = test_target_params.model_copy(update={"sleep_time_between_trials_sec": 0})
+
+    search = BracketSearch(test_target_get, params, "run_1")
+    assert not search.solved
+    while not search.solved:
+        search.run_trial()
+
+    # every trial fails, so the bracket collapses on min_req_sec
+    assert search.max_found == 0
+    assert search.breaking_point == 1
+    assert search.trials == 7
+    assert search.result_file_path == (
+        temp_directory
+        / "test_experiment_name"
+        / "test_target_get"
+        / "run_1"
+        / "results.csv"
+    )
+    assert search.result_file_path.exists()
+
+
+def test_build_searches(temp_directory, mocker):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    cfg = {
+        "targets": [
+            {"name": "first", "url": "http://localhost"},
+            {
+                "name": "second",
+                "url": "http://localhost",
+                "experiment_parameters": {"max_req_sec": 10},
+                "matrix": {"vegeta_timeout_sec": [1, 2, 3]},
+            },
+        ],
+        "experiment_parameters": test_target_params.model_dump(),
+        "matrix": {"vegeta_timeout_sec": [1, 2]},
+    }
+
+    searches = build_searches(cfg)
+
+    assert [s.label for s in searches] == [
+        "first[vegeta_timeout_sec_1]",
+        "first[vegeta_timeout_sec_2]",
+        "second[vegeta_timeout_sec_1]",
+        "second[vegeta_timeout_sec_2]",
+        "second[vegeta_timeout_sec_3]",
+    ]
+    assert searches[0].experiment_params.max_req_sec == 100
+    assert searches[2].experiment_params.max_req_sec == 10
+
+
+@pytest.mark.parametrize("key", ["experiment_name", "max_req_secs"])
+def test_build_searches_invalid_target_parameters(temp_directory, mocker, key):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    cfg = {
+        "targets": [
+            {
+                "name": "first",
+                "url": "http://localhost",
+                "experiment_parameters": {key: "x"},
+            }
+        ],
+        "experiment_parameters": test_target_params.model_dump(),
+    }
+
+    with pytest.raises(ValueError):
+        build_searches(cfg)
+
+
+def test_apply_overrides():
+    cfg = {
+        "targets": [{"name": "first", "url": "http://localhost"}],
+        "experiment_parameters": test_target_params.model_dump(),
+    }
+
+    apply_overrides(
+        cfg,
+        [
+            "max_req_sec=500",
+            "time_budget_sec=60",
+            "first:min_req_sec=50",
+            "first:url=http://localhost:8080",
+            "first:required_req_sec=200",
+        ],
+    )
+
+    assert cfg["experiment_parameters"]["max_req_sec"] == 500
+    assert cfg["scheduler"] == {"time_budget_sec": 60}
+    assert cfg["targets"][0] == {
+        "name": "first",
+        "url": "http://localhost:8080",
+        "experiment_parameters": {"min_req_sec": 50},
+        "required_req_sec": 200,
+    }
+
+
+@pytest.mark.parametrize(
+    "override",
+    [
+        "max_req_sec",
+        "unknown=1",
+        "second:max_req_sec=1",
+        "first:name=x",
+        "first:experiment_name=x",
+    ],
+)
+def test_apply_overrides_invalid(override):
+    cfg = {
+        "targets": [{"name": "first", "url": "http://localhost"}],
+        "experiment_parameters": test_target_params.model_dump(),
+    }
+
+    with pytest.raises(ValueError):
+        apply_overrides(cfg, [override])
+
+
+def test_bracket_search_resume(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    mocker.patch.object(VegetaAttacker, "run_attack", return_value=test_result)
+    params = test_target_params.model_copy(
+        update={"max_latency_upper_bound_msec": 0, "sleep_time_between_trials_sec": 0}
+    )
+
+    search = BracketSearch(test_target_get, params)
+    search.run_trial()
+    search.run_trial()
+
+    resumed = BracketSearch(test_target_get, params)
+    assert resumed.load_state()
+    assert (resumed.rate, resumed.max_found, resumed.breaking_point) == (25, 0, 50)
+    assert resumed.trials == 2
+    assert resumed.data == search.data
+
+    changed = BracketSearch(test_target_get, test_target_params)
+    assert not changed.load_state()
+
+
+def test_bracket_search_resume_ignores_csv_ahead_of_state(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    mocker.patch.object(VegetaAttacker, "run_attack", return_value=test_result)
+    params = test_target_params.model_copy(
+        update={"max_latency_upper_bound_msec": 0, "sleep_time_between_trials_sec": 0}
+    )
+
+    search = BracketSearch(test_target_get, params)
+    search.run_trial()
+    # Simulate a crash after the CSV of the second trial was saved, before its state
+    mocker.patch.object(BracketSearch, "save_state")
+    search.run_trial()
+
+    resumed = BracketSearch(test_target_get, params)
+    assert resumed.load_state()
+    assert resumed.trials == 1
+    assert [row[0] for row in resumed.data] == [100]
+
+
+def test_bracket_search_resume_truncated_state(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+
+    search = BracketSearch(test_target_get, test_target_params)
+    search.save_state()
+    search.state_file_path.write_text(search.state_file_path.read_text()[:20])
+
+    resumed = BracketSearch(test_target_get, test_target_params)
+    assert not resumed.load_state()
+    assert resumed.trials == 0
+    assert not search.state_file_path.with_suffix(".json.tmp").exists()
+
+
+def test_summarize(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    required_target = test_target_get.model_copy(update={"required_req_sec": 60})
+
+    passed = BracketSearch(test_target_get, test_target_params)
+    passed.trials, passed.max_found, passed.breaking_point = 3, 50, 51
+    passed.measured_max = 50
+    regression = BracketSearch(required_target, test_target_params)
+    regression.trials, regression.max_found, regression.breaking_point = 3, 50, 51
+    regression.measured_max = 50
+    incomplete = BracketSearch(required_target, test_target_params)
+    incomplete.trials, incomplete.max_found, incomplete.breaking_point = 1, 0, 100
+
+    assert passed.status == "pass"
+    assert regression.status == "regression"
+    assert incomplete.status == "incomplete"
+    assert summarize("experiment", [passed, incomplete])["status"] == "incomplete"
+    summary = summarize("experiment", [passed, regression, incomplete])
+    assert summary["status"] == "regression"
+    assert summary["exit_code"] == EXIT_REGRESSION
+    assert [run["status"] for run in summary["runs"]] == [
+        "pass",
+        "regression",
+        "incomplete",
+    ]
+
+
+def test_summarize_no_runs():
+    summary = summarize("experiment", [])
+
+    assert summary["status"] == "error"
+    assert summary["exit_code"] == EXIT_ERROR
+    assert summary["runs"] == []
+
+
+def test_status_all_trials_failed(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    failed_result = test_result.model_copy(update={"success": 0.0})
+    mocker.patch.object(VegetaAttacker, "run_attack", return_value=failed_result)
+    params = test_target_params.model_copy(
+        update={
+            "min_req_sec": 100,
+            "max_req_sec": 1000,
+            "sleep_time_between_trials_sec": 0,
+        }
+    )
+
+    search = BracketSearch(test_target_get, params)
+    while not search.solved:
+        search.run_trial()
+
+    assert (search.max_found, search.breaking_point) == (99, 100)
+    assert search.measured_max is None
+    assert search.status == "regression"
+
+
+def test_status_no_trials(mocker, temp_directory):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    params = test_target_params.model_copy(update={"min_req_sec": 0})
+
+    search = BracketSearch(test_target_get, params)
+
+    assert search.trials == 0
+    assert search.status == "incomplete"
+
+
+@pytest.mark.parametrize("required_req_sec", [50, 1001])
+def test_build_searches_required_out_of_range(temp_directory, mocker, required_req_sec):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    cfg = {
+        "targets": [
+            {
+                "name": "first",
+                "url": "http://localhost",
+                "required_req_sec": required_req_sec,
+            }
+        ],
+        "experiment_parameters": {
+            **test_target_params.model_dump(),
+            "min_req_sec": 100,
+            "max_req_sec": 1000,
+        },
+    }
+
+    with pytest.raises(ValueError):
+        build_searches(cfg)
+
+
+@pytest.fixture
+def config_file(temp_directory):
+    cfg_path = temp_directory / "config.yaml"
+    cfg_path.write_text(
+        json.dumps(
+            {
+                "targets": [{"name": "first", "url": "http://localhost"}],
+                "experiment_parameters": test_target_params.model_dump(),
+            }
+        )
+    )
+    return str(cfg_path)
+
+
+def test_main_json_summary(mocker, temp_directory, config_file, capsys):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    mocker.patch.object(VegetaAttacker, "run_attack", return_value=test_result)
+
+    exit_code = main(["--config", config_file, "--json", "-o", "max_req_sec=10"])
+
+    summary = json.loads(capsys.readouterr().out)
+    assert exit_code == EXIT_PASS
+    assert summary["status"] == "pass"
+    assert summary["runs"][0]["max_found_req_sec"] == 10
+    assert (temp_directory / "test_experiment_name" / "summary.json").exists()
+
+
+def test_main_if_exists_fail(mocker, temp_directory, config_file):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    (temp_directory / "test_experiment_name").mkdir()
+
+    assert main(["--config", config_file, "--if-exists", "fail"]) == EXIT_ERROR
+
+
+def test_main_json_error_summary(mocker, temp_directory, config_file, capsys):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    (temp_directory / "test_experiment_name").mkdir()
+
+    exit_code = main(["--config", config_file, "--if-exists", "fail", "--json"])
+
+    summary = json.loads(capsys.readouterr().out)
+    assert exit_code == EXIT_ERROR
+    assert summary["status"] == "error"
+    assert summary["exit_code"] == EXIT_ERROR
+    assert "already existing" in summary["error"]
+
+
+@pytest.mark.parametrize("isatty", [True, False])
+def test_main_if_exists_ask_non_interactive(
+    mocker, temp_directory, config_file, capsys, isatty
+):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    mocker.patch("sys.stdin.isatty", return_value=isatty)
+    input_mock = mocker.patch("builtins.input")
+    (temp_directory / "test_experiment_name").mkdir()
+
+    argv = ["--config", config_file] + (["--json"] if isatty else [])
+    assert main(argv) == EXIT_ERROR
+    input_mock.assert_not_called()
+    out = capsys.readouterr().out
+    if isatty:
+        assert json.loads(out)["status"] == "error"
+    else:
+        assert out == ""
+
+
+def test_main_attack_error(mocker, temp_directory, config_file):
+    mocker.patch("vegeta_ss.__main__.results_dir", temp_directory)
+    mocker.patch.object(VegetaAttacker, "run_attack", side_effect=RuntimeError("boom"))
+
+    assert main(["--config", config_file]) == EXIT_ERROR
+
+
+def test_main_invalid_config(temp_directory):
+    assert main(["--config", str(temp_directory / "missing.yaml")]) == EXIT_ERROR
+
+
+def test_main_invalid_config_json(temp_directory, capsys):
+    argv = ["--config", str(temp_directory / "missing.yaml"), "--json"]
+
+    assert main(argv) == EXIT_ERROR
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["status"] == "error"
+    assert "missing.yaml" in summary["error"]
@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+from pydantic import ValidationError
+
+from vegeta_ss.models import SchedulerParameters, Target
+from vegeta_ss.scheduler import ExperimentScheduler, expand_matrix
+
+base_params = {
+    "experiment_name": "test_experiment_name",
+    "min_req_sec": 1,
+    "max_req_sec": 100,
+    "experiment_duration_sec": 10,
+    "max_latency_upper_bound_msec": 1000,
+    "avg_latency_upper_bound_msec": 1000,
+    "sleep_time_between_trials_sec": 5,
+    "vegeta_timeout_sec": 5,
+    "save_plots": False,
+    "print_histograms": False,
+    "hist_bins": [0, 200, 400, 600],
+}
+
+
+class FakeSearch:
+    def __init__(self, name, trials_needed, trial_cost_sec=0, fail=False):
+        self.target = Target(name=name, url="http://localhost")
+        self.label = name
+        self.trials_needed = trials_needed
+        self.trial_cost_sec = trial_cost_sec
+        self.fail = fail
+        self.trials = 0
+        self.rate, self.max_found, self.breaking_point = 100, 0, 100
+        self.error = None
+        self.measured_max = None
+        self.history = []
+
+    @property
+    def bracket_width(self):
+        return self.breaking_point - self.max_found
+
+    @property
+    def done(self):
+        return self.trials >= self.trials_needed or self.error is not None
+
+    def run_trial(self):
+        self.history.append(self.label)
+        if self.fail:
+            raise RuntimeError("vegeta failed")
+        self.trials += 1
+        self.breaking_point = self.rate
+        self.rate //= 2
+
+    def log_outcome(self):
+        pass
+
+
+def test_expand_matrix_empty():
+    runs = expand_matrix(base_params, {})
+
+    assert len(runs) == 1
+    assert runs[0][0] == ""
+    assert runs[0][1].experiment_duration_sec == 10
+
+
+def test_expand_matrix_product():
+    runs = expand_matrix(
+        base_params, {"experiment_duration_sec": [10, 30], "vegeta_timeout_sec": [1, 2]}
+    )
+
+    assert [name for name, _ in runs] == [
+        "experiment_duration_sec_10-vegeta_timeout_sec_1",
+        "experiment_duration_sec_10-vegeta_timeout_sec_2",
+        "experiment_duration_sec_30-vegeta_timeout_sec_1",
+        "experiment_duration_sec_30-vegeta_timeout_sec_2",
+    ]
+    assert runs[3][1].experiment_duration_sec == 30
+    assert runs[3][1].vegeta_timeout_sec == 2
+
+
+@pytest.mark.parametrize("key", ["experiment_name", "not_a_parameter"])
+def test_expand_matrix_invalid_key(key):
+    with pytest.raises(ValueError):
+        expand_matrix(base_params, {key: [1, 2]})
+
+
+@pytest.mark.parametrize("value", [[], 5])
+def test_expand_matrix_invalid_value(value):
+    with pytest.raises(ValueError):
+        expand_matrix(base_params, {"vegeta_timeout_sec": value})
+
+
+def test_scheduler_interleaves_searches():
+    first, second = FakeSearch("first", 3), FakeSearch("second", 3)
+    second.history = first.history
+
+    ExperimentScheduler([first, second]).run()
+
+    assert first.trials == 3 and second.trials == 3
+    assert first.history == ["first", "second"] * 3
+
+
+def test_scheduler_time_budget():
+    search = FakeSearch("slow", 10, trial_cost_sec=60)
+
+    ExperimentScheduler([search], time_budget_sec=30).run()
+
+    assert search.trials == 0
+    assert not search.done
+
+
+def test_scheduler_records_errors():
+    failing, working = FakeSearch("failing", 3, fail=True), FakeSearch("working", 2)
+
+    ExperimentScheduler([failing, working], max_parallel_targets=2).run()
+
+    assert failing.error == "vegeta failed"
+    assert working.trials == 2
+
+
+def test_scheduler_runs_targets_in_parallel():
+    # Every trial waits for the others, so this only completes if they run concurrently
+    barrier = threading.Barrier(3, timeout=5)
+
+    class ConcurrentSearch(FakeSearch):
+        def run_trial(self):
+            barrier.wait()
+            super().run_trial()
+
+    searches = [ConcurrentSearch(f"target_{i}", 1) for i in range(3)]
+
+    ExperimentScheduler(searches, max_parallel_targets=3).run()
+
+    assert all(s.trials == 1 for s in searches)
+    assert not barrier.broken
+
+
+def test_scheduler_progress_fields():
+    search = FakeSearch("search", 3)
+    fields = ExperimentScheduler._progress_fields(search)
+    assert fields == {"completed": 0, "total": 8, "status": "[0, 100) req/s"}
+
+    search.run_trial()
+    fields = ExperimentScheduler._progress_fields(search)
+    assert fields["completed"] == 1 and fields["total"] == 8
+
+    search.trials, search.breaking_point = 3, search.max_found + 1
+    fields = ExperimentScheduler._progress_fields(search)
+    assert fields == {"completed": 3, "total": 3, "status": "[red]no rate passed"}
+
+    search.measured_max = 50
+    fields = ExperimentScheduler._progress_fields(search)
+    assert fields["status"] == "[green]50 req/s"
+
+    search.error = "vegeta failed"
+    fields = ExperimentScheduler._progress_fields(search)
+    assert fields == {"completed": 3, "total": 3, "status": "[red]error"}
+
+
+@pytest.mark.parametrize(
+    "params", [{"time_budget_sec": 0}, {"max_parallel_targets": 0}]
+)
+def test_scheduler_parameters_invalid(params):
+    with pytest.raises(ValidationError):
+        SchedulerParameters(**params)
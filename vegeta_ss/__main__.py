@@ -1,19 +1,46 @@
+import argparse
 import csv
 import json
 import os
 import subprocess
+import sys
 import tempfile
 import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from omegaconf import OmegaConf
 
-from vegeta_ss.models import AttackReport, Target, ExperimentParameters
+from vegeta_ss.models import (
+    AttackReport,
+    ExperimentParameters,
+    SchedulerParameters,
+    Target,
+)
+from vegeta_ss.scheduler import (
+    ExperimentScheduler,
+    check_parameter_keys,
+    expand_matrix,
+)
 from vegeta_ss.utils import format_time, logger
 
 results_dir = Path("results")
 
+EXIT_PASS = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+EXIT_INCOMPLETE = 3
+EXIT_CODES = {
+    "pass": EXIT_PASS,
+    "regression": EXIT_REGRESSION,
+    "error": EXIT_ERROR,
+    "incomplete": EXIT_INCOMPLETE,
+}
+
+
+class ExperimentError(Exception):
+    """The experiment cannot be started."""
+
 
 class VegetaAttacker:
     def __init__(
@@ -23,10 +50,14 @@ class VegetaAttacker:
         save_plots: bool = True,
         print_histograms: bool = False,
         hist_bins: tuple = (0, 100, 200, 300, 400, 500),
+        run_name: str = "",
     ):
         self.target = target
         self.experiment_name = experiment_name
         self.result_dir = results_dir / self.experiment_name / self.target.name
+        self.label = f"{target.name}[{run_name}]" if run_name else target.name
+        if run_name:
+            self.result_dir = self.result_dir / run_name
         self.save_plots = save_plots
         self.print_histograms = print_histograms
         self.hist_bins = hist_bins
@@ -83,7 +114,7 @@ class VegetaAttacker:
                 f'cat {temp_bin_filename} | vegeta report -type="hist[{hist_bins_str}]"'
             )
             hist = subprocess.run(cmd, capture_output=True, shell=True).stdout.decode()
-            logger.info(f"\n{hist}")
+            logger.info(f"{self.label}:\n{hist}")
 
         Path(temp_bin_filename).unlink(missing_ok=True)
         return AttackReport(**json_report)
@@ -97,6 +128,7 @@ def evaluate_trial(
     max_found: int,
     breaking_point: int,
     sleep_time: int,
+    label: str = "",
 ) -> tuple[int, int]:
     """Evaluate the results of a trial and return the new trial parameters.
 
@@ -108,6 +140,7 @@ def evaluate_trial(
         max_found (int): The maximum rate found so far.
         breaking_point (int): The maximum rate that failed.
         sleep_time (int): The time to wait in order to allow all services to return to clear state when a trial fails
+        label (str): The run the trial belongs to, prefixed to the log messages.
 
     Returns:
         tuple[int, int]: The new trial parameters.
@@ -125,8 +158,9 @@ def evaluate_trial(
         }
     ).replace("'", "")
     status_codes_message = f"Status code percentages: {relative_status_codes}"
+    prefix = f"{label}: " if label else ""
     logger.info(
-        f"Rate: {trial}, Success Rate: {success_rate:.2%}, "
+        f"{prefix}Rate: {trial}, Success Rate: {success_rate:.2%}, "
         f"Max Latency: {format_time(max_lat)}, Avg Latency: {format_time(avg_lat)}"
     )
 
@@ -134,27 +168,27 @@ def evaluate_trial(
 
     if success_rate < 1.0:
         logger.info(
-            f"Trial with {trial} req/s failed due to success rate {success_rate} being less than 100%."
+            f"{prefix}Trial with {trial} req/s failed due to success rate {success_rate} being less than 100%."
         )
     elif max_lat > max_ub:
         logger.info(
-            f"Trial with {trial} req/s failed due to max latency {format_time(max_lat)} exceeding upper bound {format_time(max_ub)}."
+            f"{prefix}Trial with {trial} req/s failed due to max latency {format_time(max_lat)} exceeding upper bound {format_time(max_ub)}."
         )
     elif avg_lat > avg_ub:
         logger.info(
-            f"Trial with {trial} req/s failed due to average latency {format_time(avg_lat)} exceeding upper bound {format_time(avg_ub)}."
+            f"{prefix}Trial with {trial} req/s failed due to average latency {format_time(avg_lat)} exceeding upper bound {format_time(avg_ub)}."
         )
 
     # If any of the failure conditions are met, log additional information and sleep
     if any((max_lat > max_ub, avg_lat > avg_ub, success_rate < 1.0)):
         breaking_point = trial
         logger.info(
-            f"{status_codes_message}. Errors detected: sleeping {sleep_time} seconds before performing next trial"
+            f"{prefix}{status_codes_message}. Errors detected: sleeping {sleep_time} seconds before performing next trial"
         )
         time.sleep(sleep_time)
     else:
         max_found = trial
-        logger.info(f"Trial with {trial} req/s succeeded.")
+        logger.info(f"{prefix}Trial with {trial} req/s succeeded.")
 
     return max_found, breaking_point
 
@@ -174,98 +208,461 @@ def save_results(
         writer.writerows(data_sorted)
 
 
-def run_load_test(target: Target, experiment_params: ExperimentParameters) -> None:
-    t0 = time.time()
+class BracketSearch:
+    """Bisection search of the maximum sustainable rate for a target.
 
-    # Set up trial parameters
-    max_ub = int(experiment_params.max_latency_upper_bound_msec * 1e6)
-    avg_ub = int(experiment_params.avg_latency_upper_bound_msec * 1e6)
-    rate, max_found, breaking_point = (
-        experiment_params.max_req_sec,
-        max(0, experiment_params.min_req_sec - 1),
-        experiment_params.max_req_sec,
-    )
+    The search keeps the bracket ``[max_found, breaking_point]`` between the highest rate
+    that succeeded and the lowest rate that failed, and can be advanced one trial at a
+    time so that many searches can be interleaved by a scheduler.
+    """
 
-    # Set up save results dir
-    base_dir = results_dir / experiment_params.experiment_name / target.name
-    file_name = "results.csv"
-    base_dir.mkdir(parents=True, exist_ok=True)
+    def __init__(
+        self,
+        target: Target,
+        experiment_params: ExperimentParameters,
+        run_name: str = "",
+    ):
+        self.target = target
+        self.experiment_params = experiment_params
+        self.run_name = run_name
+        self.label = f"{target.name}[{run_name}]" if run_name else target.name
+
+        # Set up trial parameters
+        self.max_ub = int(experiment_params.max_latency_upper_bound_msec * 1e6)
+        self.avg_ub = int(experiment_params.avg_latency_upper_bound_msec * 1e6)
+        self.rate, self.max_found, self.breaking_point = (
+            experiment_params.max_req_sec,
+            max(0, experiment_params.min_req_sec - 1),
+            experiment_params.max_req_sec,
+        )
+        self.data: List[list] = []
+        self.trials = 0
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+        # Highest rate that actually succeeded, unlike max_found which starts below min_req_sec
+        self.measured_max: Optional[int] = None
+
+        # Set up save results dir
+        base_dir = results_dir / experiment_params.experiment_name / target.name
+        if run_name:
+            base_dir = base_dir / run_name
+        base_dir.mkdir(parents=True, exist_ok=True)
+        self.result_file_path = base_dir / "results.csv"
+        self.state_file_path = base_dir / "state.json"
+
+    @property
+    def bracket_width(self) -> int:
+        return self.breaking_point - self.max_found
+
+    @property
+    def solved(self) -> bool:
+        return self.trials > 0 and self.bracket_width <= 1
+
+    @property
+    def done(self) -> bool:
+        return self.solved or self.error is not None
+
+    @property
+    def trial_cost_sec(self) -> int:
+        """Upper bound of the wall-clock time taken by a single trial."""
+        return (
+            self.experiment_params.experiment_duration_sec
+            + self.experiment_params.vegeta_timeout_sec
+            + self.experiment_params.sleep_time_between_trials_sec
+        )
 
-    # Run trials
-    data, solved = [], False
-    while not solved:
-        logger.info(f"Performing trial with rate {rate}")
+    def run_trial(self) -> None:
+        t0 = time.time()
+        logger.info(f"{self.label}: performing trial with rate {self.rate}")
         with VegetaAttacker(
-            target,
-            experiment_params.experiment_name,
-            experiment_params.save_plots,
-            experiment_params.print_histograms,
-            experiment_params.hist_bins,
+            self.target,
+            self.experiment_params.experiment_name,
+            self.experiment_params.save_plots,
+            self.experiment_params.print_histograms,
+            self.experiment_params.hist_bins,
+            self.run_name,
         ) as attacker:
             result = attacker.run_attack(
-                rate,
-                experiment_params.experiment_duration_sec,
-                experiment_params.vegeta_timeout_sec,
+                self.rate,
+                self.experiment_params.experiment_duration_sec,
+                self.experiment_params.vegeta_timeout_sec,
             )
-        max_found, breaking_point = evaluate_trial(
-            rate,
+        self.max_found, self.breaking_point = evaluate_trial(
+            self.rate,
             result,
-            max_ub,
-            avg_ub,
-            max_found,
-            breaking_point,
-            experiment_params.sleep_time_between_trials_sec,
+            self.max_ub,
+            self.avg_ub,
+            self.max_found,
+            self.breaking_point,
+            self.experiment_params.sleep_time_between_trials_sec,
+            self.label,
         )
-        data.append(
-            [rate, f"{result.success:.2%}"]
+        if self.max_found == self.rate:
+            self.measured_max = self.rate
+        self.data.append(
+            [self.rate, f"{result.success:.2%}"]
             + [format_time(t) for t in result.latencies.values()]
         )
+        self.trials += 1
 
-        solved = breaking_point - max_found <= 1
-        if not solved:
-            rate = int((max_found + breaking_point) / 2)
+        if not self.solved:
+            self.rate = int((self.max_found + self.breaking_point) / 2)
 
         # Save results each iteration, to avoid losing them if process stops
-        result_file_path = base_dir / file_name
-        save_results(data, result_file_path, result)
+        save_results(self.data, self.result_file_path, result)
+        self.elapsed += time.time() - t0
+        self.save_state()
+
+    def save_state(self) -> None:
+        """Save the search state, including the trial results, for a later resume.
+
+        The state is written to a temporary file and then moved in place, so that an
+        interrupted execution never leaves a truncated state behind.
+        """
+        state = {
+            "experiment_parameters": self.experiment_params.model_dump(),
+            "rate": self.rate,
+            "max_found": self.max_found,
+            "measured_max": self.measured_max,
+            "breaking_point": self.breaking_point,
+            "trials": self.trials,
+            "elapsed": self.elapsed,
+            "data": self.data,
+        }
+        temp_file_path = self.state_file_path.with_suffix(".json.tmp")
+        with open(temp_file_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_file_path, self.state_file_path)
+
+    def load_state(self) -> bool:
+        """Restore the search from the state saved by a previous execution.
+
+        The trial results are restored from the state rather than from the CSV file,
+        which may already contain a trial performed after the state was last saved.
+
+        Returns:
+            bool: Whether the state was restored. It is not when missing, unreadable or
+                saved with different experiment parameters.
+        """
+        if not self.state_file_path.exists():
+            return False
+        try:
+            with open(self.state_file_path) as f:
+                state = json.load(f)
+            saved_params = state["experiment_parameters"]
+            rate, max_found, breaking_point = (
+                state["rate"],
+                state["max_found"],
+                state["breaking_point"],
+            )
+            measured_max, trials, elapsed, data = (
+                state["measured_max"],
+                state["trials"],
+                state["elapsed"],
+                state["data"],
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"{self.label}: unreadable saved state, ignoring it: {e}")
+            return False
+        if saved_params != self.experiment_params.model_dump():
+            logger.warning(
+                f"{self.label}: experiment parameters changed, ignoring saved state"
+            )
+            return False
 
-    if max_found < experiment_params.min_req_sec:
+        self.rate, self.max_found, self.breaking_point = rate, max_found, breaking_point
+        self.measured_max, self.trials, self.elapsed = measured_max, trials, elapsed
+        self.data = data
         logger.info(
-            f"Test completed in {round(time.time() - t0)}s. Unable to find a suitable rate. Try lowering min_req_seq parameter in config. Complete results at {result_file_path}"
-        )
-    else:
-        logger.info(
-            f"Test succeeded in {round(time.time() - t0)}s. Maximum load: {max_found} req/s. Complete results at {result_file_path}"
+            f"{self.label}: resuming after {self.trials} trials, "
+            f"maximum load within [{self.max_found}, {self.breaking_point}) req/s"
         )
+        return True
+
+    @property
+    def status(self) -> str:
+        """Outcome of the search: pass, regression, incomplete or error.
+
+        The highest rate that succeeded is compared with the target ``required_req_sec``,
+        or with ``min_req_sec`` when the target does not set it.
+        """
+        required = self.target.required_req_sec
+        if required is None:
+            required = self.experiment_params.min_req_sec
+
+        if self.error is not None:
+            return "error"
+        if self.measured_max is not None and self.measured_max >= required:
+            return "pass"
+        if self.solved or (self.trials > 0 and self.breaking_point <= required):
+            return "regression"
+        return "incomplete"
+
+    def to_dict(self) -> dict:
+        return {
+            "target": self.target.name,
+            "run_name": self.run_name,
+            "status": self.status,
+            "max_found_req_sec": self.max_found,
+            "measured_max_req_sec": self.measured_max,
+            "breaking_point_req_sec": self.breaking_point,
+            "solved": self.solved,
+            "trials": self.trials,
+            "elapsed_sec": round(self.elapsed, 3),
+            "error": self.error,
+            "results_file": str(self.result_file_path),
+        }
+
+    def log_outcome(self) -> None:
+        if self.error is not None:
+            logger.error(
+                f"{self.label}: test failed after {self.trials} trials with error: {self.error}"
+            )
+        elif not self.solved:
+            logger.info(
+                f"{self.label}: test stopped after {self.trials} trials in {round(self.elapsed)}s. "
+                f"Maximum load within [{self.max_found}, {self.breaking_point}) req/s. "
+                f"Partial results at {self.result_file_path}"
+            )
+        elif self.max_found < self.experiment_params.min_req_sec:
+            logger.info(
+                f"{self.label}: test completed in {round(self.elapsed)}s. Unable to find a suitable rate. "
+                f"Try lowering min_req_seq parameter in config. Complete results at {self.result_file_path}"
+            )
+        else:
+            logger.info(
+                f"{self.label}: test succeeded in {round(self.elapsed)}s. Maximum load: {self.max_found} req/s. "
+                f"Complete results at {self.result_file_path}"
+            )
+
+
+def apply_overrides(cfg: dict, overrides: List[str]) -> dict:
+    """Apply command line overrides to the experiment configuration.
+
+    Each override has the form ``[TARGET:]KEY=VALUE``. Without a target, KEY is a global
+    experiment or scheduler parameter. With a target, KEY is an experiment parameter or
+    a field of that target. Values are parsed as YAML.
+
+    Args:
+        cfg (dict): The experiment configuration, updated in place.
+        overrides (List[str]): The overrides.
+
+    Returns:
+        dict: The updated experiment configuration.
+    """
+    targets = {target["name"]: target for target in cfg["targets"]}
+    for override in overrides:
+        key, sep, value = override.partition("=")
+        if not sep:
+            raise ValueError(
+                f"Invalid override {override}, expected [TARGET:]KEY=VALUE"
+            )
+        target_name, _, key = key.rpartition(":")
+        value = OmegaConf.to_container(OmegaConf.from_dotlist([f"value={value}"]))[
+            "value"
+        ]
+
+        if target_name:
+            if target_name not in targets:
+                raise ValueError(f"Invalid override {override}, unknown target")
+            target = targets[target_name]
+            if key in ExperimentParameters.model_fields and key != "experiment_name":
+                target.setdefault("experiment_parameters", {})[key] = value
+            elif key in Target.model_fields and key != "name":
+                target[key] = value
+            else:
+                raise ValueError(f"Invalid override {override}, unknown parameter")
+        elif key in ExperimentParameters.model_fields:
+            cfg["experiment_parameters"][key] = value
+        elif key in SchedulerParameters.model_fields:
+            cfg.setdefault("scheduler", {})[key] = value
+        else:
+            raise ValueError(f"Invalid override {override}, unknown parameter")
+    return cfg
 
 
-def main(cfg_path="vegeta_ss/config/config.yaml"):
-    cfg = OmegaConf.load(cfg_path)
+def build_searches(cfg: dict, resume: bool = False) -> List[BracketSearch]:
+    """Build one bracket search per target and per combination of the parameter matrix.
 
-    experiment_params = ExperimentParameters(**cfg.experiment_parameters)
+    Args:
+        cfg (dict): The experiment configuration.
+        resume (bool): Whether to restore the searches saved by a previous execution.
+
+    Returns:
+        List[BracketSearch]: The searches, grouped by target in configuration order.
+    """
+    searches = []
+    for target_params in cfg["targets"]:
+        target = Target(**target_params)
+        check_parameter_keys(target.experiment_parameters, f"{target.name} experiment")
+        base_params = {**cfg["experiment_parameters"], **target.experiment_parameters}
+        matrix = {**cfg.get("matrix", {}), **target.matrix}
+        for run_name, experiment_params in expand_matrix(base_params, matrix):
+            if (
+                target.required_req_sec is not None
+                and target.required_req_sec < experiment_params.min_req_sec
+            ):
+                raise ValueError(
+                    f"{target.name}: required_req_sec {target.required_req_sec} "
+                    f"is lower than min_req_sec {experiment_params.min_req_sec}"
+                )
+            if (
+                target.required_req_sec is not None
+                and target.required_req_sec > experiment_params.max_req_sec
+            ):
+                raise ValueError(
+                    f"{target.name}: required_req_sec {target.required_req_sec} "
+                    f"is higher than max_req_sec {experiment_params.max_req_sec}"
+                )
+            search = BracketSearch(target, experiment_params, run_name)
+            if not (resume and search.load_state()):
+                search.state_file_path.unlink(missing_ok=True)
+            searches.append(search)
+    return searches
+
+
+def summarize(experiment_name: str, searches: List[BracketSearch]) -> dict:
+    """Summarize the outcome of an experiment.
+
+    The experiment status is the worst status among its runs, in the order error,
+    regression, incomplete, pass. An experiment without runs measured nothing, so its
+    status is error.
+
+    Args:
+        experiment_name (str): The experiment name.
+        searches (List[BracketSearch]): The searches of the experiment.
+
+    Returns:
+        dict: The experiment summary.
+    """
+    statuses = {search.status for search in searches} or {"error"}
+    status = next(
+        (s for s in ("error", "regression", "incomplete") if s in statuses), "pass"
+    )
+    return {
+        "experiment_name": experiment_name,
+        "status": status,
+        "exit_code": EXIT_CODES[status],
+        "runs": [search.to_dict() for search in searches],
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="vegeta_ss",
+        description="Find the maximum sustainable request rate of the configured targets.",
+        epilog=(
+            f"Exit codes: {EXIT_PASS} pass, {EXIT_REGRESSION} regression, "
+            f"{EXIT_ERROR} error, {EXIT_INCOMPLETE} incomplete (time budget exhausted)."
+        ),
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        default="vegeta_ss/config/config.yaml",
+        help="Experiment configuration file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--if-exists",
+        choices=["ask", "overwrite", "resume", "fail"],
+        default="ask",
+        help=(
+            "What to do when the experiment folder already exists (default: %(default)s). "
+            "ask is refused with --json or without an interactive terminal"
+        ),
+    )
+    parser.add_argument(
+        "-o",
+        "--override",
+        action="append",
+        default=[],
+        metavar="[TARGET:]KEY=VALUE",
+        help="Override a global parameter, or a parameter of a single target. Can be repeated",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print a JSON summary of the experiment on stdout",
+    )
+    return parser.parse_args(argv)
+
+
+def run_experiment(args: argparse.Namespace) -> int:
+    cfg = OmegaConf.to_container(OmegaConf.load(args.config), resolve=True)
+    cfg = apply_overrides(cfg, args.override)
+    experiment_params = ExperimentParameters(**cfg["experiment_parameters"])
+    scheduler_params = SchedulerParameters(**cfg.get("scheduler", {}))
     result_dir = results_dir / experiment_params.experiment_name
 
     try:
         os.makedirs(result_dir)
     except FileExistsError:
-        logger.warning(
-            f"Experiment folder with name {experiment_params.experiment_name} already existing, continuing will override. Continue? [Y/n]"
-        )
-        answer = input(
-            "         --------> send n if you want to stop the experiment and exit, any other key to continue: "
-        )
-        if answer.lower() in ["n"]:
-            raise SystemExit(0)
+        if args.if_exists == "fail":
+            raise ExperimentError(
+                f"Experiment folder with name {experiment_params.experiment_name} already existing"
+            )
+        elif args.if_exists == "ask" and (args.json or not sys.stdin.isatty()):
+            raise ExperimentError(
+                f"Experiment folder with name {experiment_params.experiment_name} already existing. "
+                "Use --if-exists overwrite, resume or fail when running non-interactively"
+            )
+        elif args.if_exists == "ask":
+            logger.warning(
+                f"Experiment folder with name {experiment_params.experiment_name} already existing, continuing will override. Continue? [Y/n]"
+            )
+            answer = input(
+                "         --------> send n if you want to stop the experiment and exit, any other key to continue: "
+            )
+            if answer.lower() in ["n"]:
+                return EXIT_PASS
+            else:
+                logger.warning("Continuing. Results will override existing files.")
+        elif args.if_exists == "overwrite":
+            logger.warning(
+                f"Experiment folder with name {experiment_params.experiment_name} already existing. "
+                "Results will override existing files."
+            )
         else:
-            logger.warning("Continuing. Results will override existing files.")
+            logger.info(
+                f"Experiment folder with name {experiment_params.experiment_name} already existing. "
+                "Resuming saved searches."
+            )
 
-    for i, target_params in enumerate(cfg.targets):
-        target = Target(**target_params)
-        logger.info(
-            f"Starting load test for Target {target.name}, {i + 1} of {len(cfg.targets)} targets"
-        )
-        run_load_test(target, experiment_params)
+    searches = build_searches(cfg, resume=args.if_exists == "resume")
+    logger.info(
+        f"Starting load tests for {len(cfg['targets'])} targets, {len(searches)} runs in total"
+    )
+    ExperimentScheduler(
+        searches,
+        scheduler_params.time_budget_sec,
+        scheduler_params.max_parallel_targets,
+    ).run()
+
+    summary = summarize(experiment_params.experiment_name, searches)
+    with open(result_dir / "summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    logger.info(
+        f"Experiment {experiment_params.experiment_name} completed with status {summary['status']}"
+    )
+    return summary["exit_code"]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        return run_experiment(args)
+    except ExperimentError as e:
+        logger.error(str(e))
+        error = str(e)
+    except Exception as e:
+        logger.exception(f"Experiment failed: {e}")
+        error = f"Experiment failed: {e}"
+    if args.json:
+        print(json.dumps({"status": "error", "exit_code": EXIT_ERROR, "error": error}))
+    return EXIT_ERROR
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -39,6 +39,17 @@ class Target(BaseModel):
     method: HTTPMethod = Field(HTTPMethod.GET, description="HTTP method")
     headers: Optional[Dict[str, str]] = Field({}, description="HTTP headers")
     body_file: Optional[str] = Field(None, description="File path for the request body")
+    experiment_parameters: Optional[Dict[str, Any]] = Field(
+        {}, description="Experiment parameters overriding the global ones"
+    )
+    required_req_sec: Optional[int] = Field(
+        None,
+        description="Rate the target must sustain, lower measured rates are regressions",
+    )
+    matrix: Optional[Dict[str, List[Any]]] = Field(
+        {},
+        description="Experiment parameter values to expand, merged with the global matrix",
+    )
 
 
 class ExperimentParameters(BaseModel):
@@ -53,3 +64,14 @@ class ExperimentParameters(BaseModel):
     save_plots: bool
     print_histograms: bool
     hist_bins: List[int]
+
+
+class SchedulerParameters(BaseModel):
+    time_budget_sec: Optional[int] = Field(
+        None,
+        gt=0,
+        description="Wall-clock budget for the whole experiment, unlimited if unset",
+    )
+    max_parallel_targets: int = Field(
+        1, ge=1, description="Maximum number of targets attacked at the same time"
+    )
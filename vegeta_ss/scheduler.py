@@ -0,0 +1,174 @@
+import itertools
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from rich.markup import escape
+from rich.progress import (
+    BarColumn,
+    MofNCompleteColumn,
+    Progress,
+    TextColumn,
+    TimeElapsedColumn,
+)
+
+from vegeta_ss.models import ExperimentParameters
+from vegeta_ss.utils import console, logger
+
+PROGRESS_REFRESH_PER_SECOND = 2
+
+
+def check_parameter_keys(keys, source: str) -> None:
+    """Check that keys are experiment parameters that can vary between runs.
+
+    Args:
+        keys: The parameter names.
+        source (str): Where the parameters come from, used in the error message.
+
+    Raises:
+        ValueError: If a key is not an experiment parameter or is ``experiment_name``.
+    """
+    invalid = [
+        k
+        for k in keys
+        if k not in ExperimentParameters.model_fields or k == "experiment_name"
+    ]
+    if invalid:
+        raise ValueError(f"Invalid {source} parameters: {invalid}")
+
+
+def expand_matrix(
+    base_params: Dict[str, Any], matrix: Dict[str, List[Any]]
+) -> List[tuple[str, ExperimentParameters]]:
+    """Expand a parameter matrix into one set of experiment parameters per combination.
+
+    Args:
+        base_params (Dict[str, Any]): The experiment parameters shared by every combination.
+        matrix (Dict[str, List[Any]]): The values to try for each experiment parameter.
+
+    Returns:
+        List[tuple[str, ExperimentParameters]]: The run name and parameters of each combination.
+            The run name is empty when the matrix is empty.
+    """
+    check_parameter_keys(matrix, "matrix")
+    not_lists = [k for k, v in matrix.items() if not isinstance(v, list) or not v]
+    if not_lists:
+        raise ValueError(f"Matrix parameters must be non-empty lists: {not_lists}")
+
+    keys = list(matrix)
+    runs = []
+    for values in itertools.product(*(matrix[k] for k in keys)):
+        overrides = dict(zip(keys, values))
+        run_name = "-".join(f"{k}_{v}" for k, v in overrides.items())
+        runs.append((run_name, ExperimentParameters(**{**base_params, **overrides})))
+    return runs
+
+
+class ExperimentScheduler:
+    """Run the trials of many bracket searches within an optional wall-clock budget.
+
+    Trials are scheduled one at a time per search, always picking the search with the
+    fewest trials so far and the widest bracket, so that when the budget runs out every
+    search has narrowed its bracket as much as possible. A target is never attacked by
+    two trials at the same time.
+
+    The progress of every search is shown in a single live view, refreshed at most
+    ``PROGRESS_REFRESH_PER_SECOND`` times per second by a background thread.
+    """
+
+    def __init__(
+        self,
+        searches: list,
+        time_budget_sec: Optional[int] = None,
+        max_parallel_targets: int = 1,
+    ):
+        self.searches = searches
+        self.time_budget_sec = time_budget_sec
+        self.max_parallel_targets = max_parallel_targets
+
+    def _next_search(self, busy_targets: set, deadline: Optional[float]):
+        candidates = [
+            search
+            for search in self.searches
+            if not search.done
+            and search.target.name not in busy_targets
+            and (deadline is None or time.time() + search.trial_cost_sec <= deadline)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: (s.trials, -s.bracket_width))
+
+    @staticmethod
+    def _progress_fields(search) -> dict:
+        if search.error is not None:
+            remaining, status = 0, "[red]error"
+        elif search.done and search.measured_max is None:
+            remaining, status = 0, "[red]no rate passed"
+        elif search.done:
+            remaining, status = 0, f"[green]{search.measured_max} req/s"
+        else:
+            # The first trial is at the top of the bracket, then bisection halves it
+            remaining = max(1, math.ceil(math.log2(max(search.bracket_width, 1))))
+            if search.trials == 0:
+                remaining += 1
+            status = escape(f"[{search.max_found}, {search.breaking_point}) req/s")
+        return {
+            "completed": search.trials,
+            "total": search.trials + remaining,
+            "status": status,
+        }
+
+    def run(self) -> list:
+        deadline = (
+            time.time() + self.time_budget_sec
+            if self.time_budget_sec is not None
+            else None
+        )
+
+        progress = Progress(
+            TextColumn("{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[status]}"),
+            TimeElapsedColumn(),
+            console=console,
+            refresh_per_second=PROGRESS_REFRESH_PER_SECOND,
+        )
+        pool = ThreadPoolExecutor(max_workers=self.max_parallel_targets)
+        with progress, pool:
+            tasks = {
+                search: progress.add_task(
+                    escape(search.label), **self._progress_fields(search)
+                )
+                for search in self.searches
+            }
+            in_flight = {}
+            while True:
+                busy_targets = {s.target.name for s in in_flight.values()}
+                while len(in_flight) < self.max_parallel_targets:
+                    search = self._next_search(busy_targets, deadline)
+                    if search is None:
+                        break
+                    progress.update(tasks[search], status=f"rate {search.rate}")
+                    in_flight[pool.submit(search.run_trial)] = search
+                    busy_targets.add(search.target.name)
+
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    search = in_flight.pop(future)
+                    if future.exception() is not None:
+                        search.error = str(future.exception())
+                        logger.error(f"{search.label}: {search.error}")
+                    progress.update(tasks[search], **self._progress_fields(search))
+
+        if any(not search.done for search in self.searches):
+            logger.warning(
+                f"Time budget of {self.time_budget_sec}s exhausted, reporting partial brackets"
+            )
+        for search in self.searches:
+            search.log_outcome()
+        return self.searches
@@ -1,6 +1,11 @@
+import atexit
+import json
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
+from rich.console import Console
 from rich.logging import RichHandler
 
 ROOT_PATH = Path(__file__).parent.parent
@@ -8,6 +13,9 @@ LOG_LOCATION = "./var/log/app.log"
 LOG_LEVEL = logging.INFO
 LOG_FORMAT = "[%(asctime)s]" " %(message)s [%(pathname)s:%(lineno)d]"
 
+# Shared by the log handler and the progress view, so that logs are printed above it
+console = Console(stderr=True)
+
 
 class RelativePathFormatter(logging.Formatter):
     def format(self, record):
@@ -18,6 +26,33 @@ class RelativePathFormatter(logging.Formatter):
         return super().format(record)
 
 
+class JsonFormatter(RelativePathFormatter):
+    def format(self, record):
+        super().format(record)
+        line = {
+            "time": record.asctime,
+            "level": record.levelname,
+            "message": record.message,
+            "path": record.pathname,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_text:
+            line["exception"] = record.exc_text
+        return json.dumps(line, ensure_ascii=False)
+
+
+class UnformattedQueueHandler(QueueHandler):
+    """Enqueue records as they are, leaving all formatting to the listener thread.
+
+    The default ``prepare`` merges the message arguments and formats tracebacks on the
+    calling thread, which is only needed when records cross process boundaries.
+    """
+
+    def prepare(self, record):
+        return record
+
+
 def format_time(time_in_ns: int) -> str:
     """Format time in nanoseconds to a human-readable string.
 
@@ -37,8 +72,16 @@ def format_time(time_in_ns: int) -> str:
 
 
 def get_logger(__name__):
-    def _get_custom_handler(handler, format, filter=None):
-        handler.setFormatter(RelativePathFormatter(format))
+    """Get a logger whose records are formatted and written by a background thread.
+
+    The logger only enqueues records, so that the threads running the trials never
+    format them nor block on file or terminal I/O. Records are formatted, written as
+    JSON lines to the log file and rendered on the console by a listener thread,
+    stopped at exit.
+    """
+
+    def _get_custom_handler(handler, formatter, filter=None):
+        handler.setFormatter(formatter)
         if filter:
             handler.addFilter(filter)
         return handler
@@ -50,13 +93,20 @@ def get_logger(__name__):
     _logger.setLevel(LOG_LEVEL)
 
     file_handler = logging.FileHandler(LOG_LOCATION)
-    custom_file_handler = _get_custom_handler(file_handler, LOG_FORMAT)
-    _logger.addHandler(custom_file_handler)
+    custom_file_handler = _get_custom_handler(file_handler, JsonFormatter(LOG_FORMAT))
 
     console_handler = _get_custom_handler(
-        RichHandler(show_time=False, show_path=False), LOG_FORMAT
+        RichHandler(console=console, show_time=False, show_path=False),
+        RelativePathFormatter(LOG_FORMAT),
+    )
+
+    log_queue = queue.SimpleQueue()
+    _logger.addHandler(UnformattedQueueHandler(log_queue))
+    listener = QueueListener(
+        log_queue, custom_file_handler, console_handler, respect_handler_level=True
     )
-    _logger.addHandler(console_handler)
+    listener.start()
+    atexit.register(listener.stop)
 
     return _logger
 